@@ -12,9 +12,10 @@ CC-Canto, per https://cantonese.org/about.html, builds on CC-CEDICT by:
 The CC-Canto format augments CC-CEDICT entries with a Jyutping field.
 """
 
-import ast                  # Abstract syntax tree helper, e.g. can convert a "list-like" string to a list
 import cmd                  # Command line interpreter support
 import click
+import functools
+import json
 import logging
 import os
 import re
@@ -30,6 +31,13 @@ from typing import Any, Dict, List, Optional, TypeVar, Union
 from click_shell import make_click_shell, Shell
 from shell_with_default.shell_with_default import click_group_with_default, ClickShellWithDefault
 
+try:
+    import re2              # Linear time regular expression matching (optional)
+    RE2_OPTIONS = re2.Options()
+    RE2_OPTIONS.log_errors = False  # Unsupported patterns fall back on re, so don't report them
+except ImportError:
+    re2 = None
+
 
 canto_logger    = logging.getLogger(__name__)
 console_handler = logging.StreamHandler(sys.stdout)
@@ -43,7 +51,7 @@ canto_logger.setLevel(logging.INFO)
 ##################
 # Dictionary files
 ##################
-CC_DIR              = "/mnt/d/src/cccanto"
+CC_DIR              = os.environ.get("CCDICT_DATA_DIR", "/mnt/d/src/cccanto")
 CCCEDICT_FILE       = "cedict_1_0_ts_utf-8_mdbg.txt"
 CCCANTO_FILE        = "cccanto-webdist.txt"
 CCCEDICT_CANTO_FILE = "cccedict-canto-readings-150923.txt"
@@ -68,8 +76,9 @@ DE_FLD_COMMENT  = "comment"
 DE_FLD_CJCODE   = "cjcode"
 DE_FLD_CJCHAR   = "character"
 
-DE_FLDS_NAMES   = [name for name in list(locals().keys()) if re.match("DE_FLD_", name)]
-DE_FLDS         = [eval(fld_name) for fld_name in DE_FLDS_NAMES]
+DE_FLDS_BY_NAME = {name: value for name, value in list(locals().items()) if re.match("DE_FLD_", name)}
+DE_FLDS_NAMES   = list(DE_FLDS_BY_NAME.keys())
+DE_FLDS         = list(DE_FLDS_BY_NAME.values())
 
 #
 # CC-CEDICT format:
@@ -92,6 +101,52 @@ JYUTPING_PATT   = fr"({{(?P<{DE_FLD_JYUTPING}>[^}}]+)}})"
 ENG_PATT        = fr"(/(?P<{DE_FLD_ENGLISH}>.*)/)"
 COMMENT_PATT    = fr"(#\s+(?P<{DE_FLD_COMMENT}>.*$))"
 DICT_PATT       = fr"{TRAD_PATT}\s+{SIMP_PATT}\s+{PINYIN_PATT}\s+{JYUTPING_PATT}?\s*{ENG_PATT}?\s*{COMMENT_PATT}?"
+DICT_RE         = re.compile(DICT_PATT)
+
+# Numbers of the DICT_PATT groups for each field of a parsed entry, allowing
+# all fields to be retrieved in one call to Match.group()
+DICT_PATT_GROUPS = tuple(DICT_RE.groupindex[fld] for fld in [DE_FLD_TRAD,
+                                                             DE_FLD_SIMP,
+                                                             DE_FLD_PINYIN,
+                                                             DE_FLD_JYUTPING,
+                                                             DE_FLD_ENGLISH,
+                                                             DE_FLD_COMMENT])
+
+###############################################################################
+# Full-text search support
+###############################################################################
+# Fields covered by the (trigram) full-text search index on the core table
+FTS_FLDS        = [DE_FLD_ENGLISH, DE_FLD_JYUTPING, DE_FLD_PINYIN]
+
+###############################################################################
+# Regular expression analysis, to identify searches that can be performed by
+# cheaper means
+###############################################################################
+# Characters that give a regular expression a meaning other than a literal
+# (sub)string match
+RE_META_CHARS   = ".^$*+?{}[]\\|()"
+
+# Regular expressions that match values containing a literal, optionally
+# anchored to the start and/or end of the value, e.g. abc, ^abc, ^abc.*$, abc$
+RE_LITERAL_PATT = fr"(?P<start>\^)?(?P<literal>[^{re.escape(RE_META_CHARS)}]+)(?P<any>\.\*)?(?P<end>\$)?"
+RE_LITERAL_RE   = re.compile(RE_LITERAL_PATT)
+
+# Regular expression that matches a complete escape sequence, including the
+# digits or name of escapes that specify a character by its code or name, and
+# the digits of octal escapes and group references
+RE_ESCAPE_PATT  = r"\\(x[0-9a-fA-F]{0,2}|u[0-9a-fA-F]{0,4}|U[0-9a-fA-F]{0,8}|N\{[^}]*\}|0[0-7]{0,2}|[0-7]{3}|[0-9]{1,2}|.)?"
+RE_ESCAPE_RE    = re.compile(RE_ESCAPE_PATT, re.DOTALL)
+
+# Regular expression that matches syntax that re2 accepts but interprets
+# differently to re:
+#   - Perl character classes and word boundaries, which re2 restricts to ASCII
+#     characters but re applies to all Unicode characters (e.g. \w matches 們
+#     and \d matches ３ with re, but not re2)
+#   - {,n} repetitions, which re reads as {0,n} but re2 as literal text
+#   - [:alpha:] etc., which re2 reads as POSIX classes but re as sets of
+#     characters
+RE2_INCOMPATIBLE_PATT   = r"\\[dDsSwWbB]|\{,|\[:"
+RE2_INCOMPATIBLE_RE     = re.compile(RE2_INCOMPATIBLE_PATT)
 
 ###############################################################################
 # A class to help with dictionary lookup
@@ -131,7 +186,51 @@ class DictSearchTerm(object):
         """
         A read-only property that specifies which search operation to use
         """
-        return "REGEXP" if self.use_re else "="
+        if not(self.use_re):
+            return "="
+        re_literal_search = self.re_literal_search
+        return re_literal_search[0] if re_literal_search else "REGEXP"
+    ###########################################################################
+
+
+    ###########################################################################
+    @property
+    def search_operand(self):
+        """
+        A read-only property that specifies the value the search field is
+        compared with by the search operation
+        """
+        re_literal_search = self.re_literal_search if self.use_re else None
+        return re_literal_search[1] if re_literal_search else self.search_value
+    ###########################################################################
+
+
+    ###########################################################################
+    @property
+    def re_literal_search(self):
+        """
+        A read-only property that specifies the search operation and operand
+        equivalent to a regular expression search value that simply matches a
+        literal, e.g.
+            ^abc$       => = abc
+            ^abc, ^abc.*=> GLOB abc*
+            abc$        => GLOB *abc
+            abc         => GLOB *abc*
+        or None if the search value isn't such a regular expression.
+        Unlike REGEXP, these operations don't call back into Python for each
+        row tested, and can make use of an index on the search field for
+        equality and prefix searches.
+        """
+        literal_match = RE_LITERAL_RE.fullmatch(self.search_value)
+        if not literal_match:
+            return None
+
+        literal = literal_match["literal"]
+        match_start = literal_match["start"] is not None
+        match_end = literal_match["end"] is not None and literal_match["any"] is None
+        if match_start and match_end:
+            return ("=", literal)
+        return ("GLOB", f"{'' if match_start else '*'}{literal}{'' if match_end else '*'}")
     ###########################################################################
 
 
@@ -141,7 +240,45 @@ class DictSearchTerm(object):
         """
         A read-only property that specifies the SQL query condition
         """
+        if self.fts_value is not None:
+            return f"({self.search_field} {self.search_op} ? AND \
+                      cc_canto.rowid IN (SELECT rowid FROM cc_canto_fts \
+                                         WHERE  cc_canto_fts.{self.search_field} MATCH ?))"
         return f"{self.search_field} {self.search_op} ?"
+    ###########################################################################
+
+
+    ###########################################################################
+    @property
+    def search_params(self):
+        """
+        A read-only property that specifies the parameter values for the SQL
+        query condition
+        """
+        if self.fts_value is not None:
+            return (self.search_operand, self.fts_value)
+        return (self.search_operand,)
+    ###########################################################################
+
+
+    ###########################################################################
+    @property
+    def fts_value(self):
+        """
+        A read-only property that specifies a full-text search query that
+        narrows down the rows a regular expression search needs to test, or
+        None if the search can't be narrowed down this way.
+        The full-text search index uses the trigram tokenizer, which matches
+        substrings of 3 or more characters regardless of case, so any field
+        that contains a literal substring required by the regular expression
+        will also match the full-text search query.
+        """
+        if not(self.use_re) or self.search_field not in FTS_FLDS:
+            return None
+        literal = re_required_literal(self.search_value)
+        if not literal or len(literal) < 3:
+            return None
+        return '"{}"'.format(literal.replace('"', '""'))
 ###############################################################################
 
 
@@ -156,10 +293,11 @@ class CantoDict(object):
         DOF_JSON = auto()
 
     def __init__(self,
-                 dict_db_filename  = ":memory:",
+                 dict_db_filename  = DICT_DB_FILENAME,
                  dict_file_dir     = CC_DIR,
                  cj_file_dir       = CJ_DIR,
-                 force_reload      = False):
+                 force_reload      = False,
+                 in_memory         = False):
         """
         Cantonese dictionary constructor
 
@@ -168,25 +306,94 @@ class CantoDict(object):
                                     (text) files
         :param  cj_file_dir:        Directory hosting the Cangjie definition
                                     (text) file
+        :param  force_reload:       If True, rebuild the database from the
+                                    text files even if it is already populated
+        :param  in_memory:          If True, once loaded, search a copy of the
+                                    database held in memory
         """
         self.db_filename    = dict_db_filename
         self.dict_file_dir  = dict_file_dir
         self.cj_file_dir    = cj_file_dir
+        self.in_memory      = in_memory
 
         #
         # Set up database connection objects
         #
-        self.db_con = sqlite3.connect(dict_db_filename)
-        self.db_con.row_factory = sqlite3.Row           # Allow use of named columns in query results
-        self.db_con.load_extension("/mnt/d/src/sqlite3_extensions/regexp")
-        self.db_con.create_function("REGEXP", 2, regexp)
-        self.db_cur = self.db_con.cursor()
+        self.set_db_con(sqlite3.connect(dict_db_filename))
 
         #
         # Load!
         #
+        self.load(force_reload=force_reload)
+
+        if in_memory:
+            self.copy_to_memory()
+    ###########################################################################
+
+
+    ###########################################################################
+    def set_db_con(self, db_con: sqlite3.Connection):
+        """
+        Sets up the database connection (and cursor) used to access the
+        dictionary data.
+
+        :param  db_con: An open database connection
+        """
+        self.db_con = db_con
+        self.db_con.row_factory = sqlite3.Row           # Allow use of named columns in query results
+        self.db_con.execute("PRAGMA cache_size = -32768")   # Keep up to 32MB of database pages cached
+        self.db_con.execute("PRAGMA mmap_size = 268435456") # Read up to 256MB of the database file via mmap
+        self.db_con.create_function("REGEXP", 2, regexp, deterministic=True)
+        self.db_cur = self.db_con.cursor()
+    ###########################################################################
+
+
+    ###########################################################################
+    def copy_to_memory(self):
+        """
+        Replaces the connection to the database file with a connection to an
+        in-memory copy of the database, so searches never wait on disk reads.
+        Changes made after the copy (e.g. by a forced reload) are not saved to
+        the database file.
+        """
+        mem_db_con = sqlite3.connect(":memory:")
+        self.db_con.backup(mem_db_con)
+        self.db_con.close()
+        self.set_db_con(mem_db_con)
+    ###########################################################################
+
+
+    ###########################################################################
+    def reload(self):
+        """
+        Rebuilds the database file from the text files, then resumes searching
+        the rebuilt database (or an in-memory copy of it).
+        The dictionary object itself is kept, so anything holding it sees the
+        reloaded data.
+        """
+        old_db_con = self.db_con
+        self.set_db_con(sqlite3.connect(self.db_filename))
+        self.load(force_reload=True)
+        old_db_con.close()
+
+        if self.in_memory:
+            self.copy_to_memory()
+    ###########################################################################
+
+
+    ###########################################################################
+    def load(self, force_reload: bool = False):
+        """
+        Loads the dictionary data, Cangjie definitions and search indexes,
+        (re)building them from the source text files as required.
+
+        :param  force_reload:   If True, unconditionally (re)load everything
+                                from the text files
+        """
         self.load_dict(force_reload=force_reload)
         self.load_canjie_defs(force_reload=force_reload)
+        self.load_search_index(force_reload=force_reload)
+        self.create_indexes()
     ###########################################################################
 
 
@@ -216,7 +423,8 @@ class CantoDict(object):
         # Clean out existing tables
         #
         for table_name in ["cc_cedict", "cc_canto", "cc_cedict_canto",
-                           "cedict_joined", "cedict_orphans", "cedict_canto_orphans"]:
+                           "cedict_joined", "cedict_orphans", "cedict_canto_orphans",
+                           "cc_canto_fts"]:
             db_cur.execute(f"DROP TABLE IF EXISTS {table_name}")
 
         for table_name in ["cc_cedict", "cc_canto", "cc_cedict_canto"]:
@@ -230,17 +438,17 @@ class CantoDict(object):
         #
         # Initiate core dictionary table with "pure" Cantonese data
         #
-        canto_tuples = parse_dict_entries(f"{self.dict_file_dir}/{CCCANTO_FILE}")
+        canto_tuples = iter_dict_entries(f"{self.dict_file_dir}/{CCCANTO_FILE}")
         db_cur.executemany("INSERT INTO cc_canto VALUES(?, ?, ?, ?, ?, ?)", canto_tuples)
 
         #
         # Import CC-CEDICT/-Canto data
         #
-        cedict_tuples = parse_dict_entries(f"{self.dict_file_dir}/{CCCEDICT_FILE}")
+        cedict_tuples = iter_dict_entries(f"{self.dict_file_dir}/{CCCEDICT_FILE}")
         db_cur.executemany("INSERT INTO cc_cedict VALUES(?, ?, ?, ?, ?, ?)",
                 cedict_tuples)
 
-        cedict_canto_tuples = parse_dict_entries(f"{self.dict_file_dir}/{CCCEDICT_CANTO_FILE}")
+        cedict_canto_tuples = iter_dict_entries(f"{self.dict_file_dir}/{CCCEDICT_CANTO_FILE}")
         db_cur.executemany("INSERT INTO cc_cedict_canto VALUES(?, ?, ?, ?, ?, ?)",
             cedict_canto_tuples)
 
@@ -415,6 +623,62 @@ class CantoDict(object):
     ###########################################################################
 
 
+    ###########################################################################
+    def load_search_index(self, force_reload = False, save_changes = True):
+        """
+        Builds the full-text search index over the core dictionary table as
+        required.
+
+        :param  force_reload:   If True, unconditionally rebuild the index
+        :param  save_changes:   If True, saves the results of a (re)build
+        """
+        # Copy of the cursor for convenience
+        db_cur = self.db_cur
+
+        if not(force_reload) and table_exists(db_cur, "cc_canto_fts") and \
+           table_columns(db_cur, "cc_canto_fts") == FTS_FLDS:
+            return
+
+        print("Creating cc_canto_fts")
+
+        #
+        # An external content table, i.e. only the index is stored, with the
+        # text itself read from cc_canto as required
+        #
+        db_cur.execute("DROP TABLE IF EXISTS cc_canto_fts")
+        db_cur.execute(f"CREATE VIRTUAL TABLE cc_canto_fts USING fts5({', '.join(FTS_FLDS)}, \
+                                                                     content=cc_canto, \
+                                                                     tokenize=trigram)")
+        db_cur.execute("INSERT INTO cc_canto_fts(cc_canto_fts) VALUES('rebuild')")
+
+        if save_changes:
+            self.save_dict()
+    ###########################################################################
+
+
+    ###########################################################################
+    def create_indexes(self, save_changes = True):
+        """
+        Creates indexes on the columns used for exact match lookups (including
+        those tried by default in search all fields mode) and for joining
+        dictionary entries with their Cangjie codes, if they don't already
+        exist.
+
+        :param  save_changes:   If True, saves any new indexes
+        """
+        for table_name, column_name in [("cc_canto", DE_FLD_TRAD),
+                                        ("cc_canto", DE_FLD_SIMP),
+                                        ("cc_canto", DE_FLD_JYUTPING),
+                                        ("cj_dict",  DE_FLD_CJCHAR),
+                                        ("cj_dict",  DE_FLD_CJCODE)]:
+            self.db_cur.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_{column_name}_idx \
+                                  ON {table_name}({column_name})")
+
+        if save_changes:
+            self.save_dict()
+    ###########################################################################
+
+
     ###########################################################################
     def save_dict(self):
         """
@@ -424,6 +688,15 @@ class CantoDict(object):
     ###########################################################################
 
 
+    ###########################################################################
+    def close(self):
+        """
+        Closes the connection to the dictionary database.
+        """
+        self.db_con.close()
+    ###########################################################################
+
+
     ###########################################################################
     @staticmethod
     def is_multiple_value_field(field: str) -> bool:
@@ -492,7 +765,7 @@ class CantoDict(object):
                 # Convert fields that can have multiple values per entry to lists
                 if CantoDict.is_multiple_value_field(field):
                     #print(f"Current field value = {dict_entry[field]}")
-                    dict_entry[field] = ast.literal_eval(dict_entry[field])
+                    dict_entry[field] = json.loads(dict_entry[field])
 
         return dict_entries
     ###########################################################################
@@ -518,9 +791,37 @@ class CantoDict(object):
         #
         # Extract the WHERE clause conditions from the search terms
         #
-        where_clause = " AND ".join([search_term.search_cond for search_term in search_expr])
-        where_values = tuple([search_term.search_value for search_term in search_expr])
+        search_conds = list()
+        where_values = list()
+        for search_term in search_expr:
+            search_conds.append(search_term.search_cond)
+            where_values.extend(search_term.search_params)
+        where_clause = " AND ".join(search_conds)
+
+        canto_query = CantoDict.get_search_query(where_clause, flatten_pinyin)
+        self.db_cur.execute(canto_query, where_values)
+        return [dict(row) for row in self.db_cur.fetchall()]
+    ###########################################################################
 
+
+    ###########################################################################
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def get_search_query(where_clause: str,
+                         flatten_pinyin: bool) -> str:
+        """
+        Returns the query that retrieves dictionary entries matching a WHERE
+        clause.
+        Queries are cached so that repeated searches don't rebuild the query
+        string. (sqlite3's statement cache is keyed on the query text, so
+        identical queries reuse a prepared statement with or without this
+        cache.)
+
+        :param  where_clause:   Search conditions, with ? placeholders for
+                                the search values
+        :param  flatten_pinyin: If True, flatten pinyin groupings in search results
+        :returns the query
+        """
         #
         # Build a two-stage query that groups records matching the search terms
         # according to Jyutping and English definition
@@ -531,7 +832,7 @@ class CantoDict(object):
                           WITH matching_defs({DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_PINYIN}, {DE_FLD_ENGLISH}, {DE_FLD_CJCODE}, {DE_FLD_SIMP})
                           AS
                               (SELECT {DE_FLD_TRAD},
-                                      regexp_replace(json_group_array(DISTINCT({DE_FLD_JYUTPING})), 'null,?', ''),
+                                      json_group_array(DISTINCT({DE_FLD_JYUTPING})) FILTER (WHERE {DE_FLD_JYUTPING} IS NOT NULL),
                                       group_concat(DISTINCT({DE_FLD_PINYIN})),
                                       {DE_FLD_ENGLISH},
                                       cj_dict.{DE_FLD_CJCODE},
@@ -542,8 +843,8 @@ class CantoDict(object):
                                GROUP BY {DE_FLD_TRAD}, {DE_FLD_ENGLISH}, {DE_FLD_CJCODE}, {DE_FLD_SIMP})
                           SELECT {DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_SIMP},
                                  group_concat(DISTINCT({DE_FLD_PINYIN})) AS {DE_FLD_PINYIN},
-                                 regexp_replace(json_group_array(DISTINCT({DE_FLD_ENGLISH})), 'null,?', '') AS {DE_FLD_ENGLISH},
-                                 regexp_replace(json_group_array(DISTINCT({DE_FLD_CJCODE})), 'null,?', '') AS {DE_FLD_CJCODE}
+                                 json_group_array(DISTINCT({DE_FLD_ENGLISH})) FILTER (WHERE {DE_FLD_ENGLISH} IS NOT NULL) AS {DE_FLD_ENGLISH},
+                                 json_group_array(DISTINCT({DE_FLD_CJCODE})) FILTER (WHERE {DE_FLD_CJCODE} IS NOT NULL) AS {DE_FLD_CJCODE}
                           FROM   matching_defs
                           GROUP BY {DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_SIMP}
                           """
@@ -552,7 +853,7 @@ class CantoDict(object):
                           WITH matching_defs({DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_PINYIN}, {DE_FLD_ENGLISH}, {DE_FLD_CJCODE})
                           AS
                               (SELECT {DE_FLD_TRAD},
-                                      regexp_replace(json_group_array(DISTINCT({DE_FLD_JYUTPING})), 'null,?', ''),
+                                      json_group_array(DISTINCT({DE_FLD_JYUTPING})) FILTER (WHERE {DE_FLD_JYUTPING} IS NOT NULL),
                                       group_concat(DISTINCT({DE_FLD_PINYIN})),
                                       {DE_FLD_ENGLISH},
                                       group_concat(DISTINCT({DE_FLD_CJCODE}))
@@ -562,14 +863,13 @@ class CantoDict(object):
                                GROUP BY {DE_FLD_TRAD}, {DE_FLD_ENGLISH}, {DE_FLD_CJCODE}
                                ORDER BY {DE_FLD_PINYIN})
                           SELECT {DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_PINYIN},
-                                 regexp_replace(json_group_array(DISTINCT({DE_FLD_ENGLISH})), 'null,?', '') AS {DE_FLD_ENGLISH},
-                                 regexp_replace(json_group_array(DISTINCT({DE_FLD_CJCODE})), 'null,?', '') AS {DE_FLD_CJCODE}
+                                 json_group_array(DISTINCT({DE_FLD_ENGLISH})) FILTER (WHERE {DE_FLD_ENGLISH} IS NOT NULL) AS {DE_FLD_ENGLISH},
+                                 json_group_array(DISTINCT({DE_FLD_CJCODE})) FILTER (WHERE {DE_FLD_CJCODE} IS NOT NULL) AS {DE_FLD_CJCODE}
                           FROM   matching_defs
                           GROUP BY {DE_FLD_TRAD}, {DE_FLD_JYUTPING}, {DE_FLD_PINYIN}
                           """
 
-        self.db_cur.execute(canto_query, where_values)
-        return [dict(row) for row in self.db_cur.fetchall()]
+        return canto_query
     ###########################################################################
 
 
@@ -630,8 +930,10 @@ class CantoDict(object):
             fields:         The fields to include in the string
         :returns nothing
         """
-        for formatted_search_result in self.get_formatted_search_results(search_expr, **kwargs):
-            print(formatted_search_result)
+        # Write all results at once rather than issuing a print per result
+        formatted_search_results = self.get_formatted_search_results(search_expr, **kwargs)
+        if formatted_search_results:
+            sys.stdout.write("\n".join(formatted_search_results) + "\n")
     ###########################################################################
 
 
@@ -721,6 +1023,35 @@ class CantoDict(object):
 ###############################################################################
 
 
+###############################################################################
+# Dictionaries shared between shells, keyed by database filename
+shared_canto_dicts: Dict[str, CantoDict] = dict()
+
+def get_canto_dict(dict_db_filename: str = DICT_DB_FILENAME,
+                   force_reload: bool = False) -> CantoDict:
+    """
+    Returns the dictionary for a database file, opening (and if necessary,
+    loading) it only the first time it's requested, and searching an
+    in-memory copy of the database, so that subsequent shells reuse it.
+
+    :param  dict_db_filename:   sqlite3 database filename
+    :param  force_reload:       If True, rebuild the database from the text
+                                files even if it is already populated
+    :returns the dictionary
+    """
+    canto_dict = shared_canto_dicts.get(dict_db_filename)
+    if canto_dict is None:
+        canto_dict = CantoDict(dict_db_filename, force_reload=force_reload, in_memory=True)
+        shared_canto_dicts[dict_db_filename] = canto_dict
+    elif force_reload:
+        #
+        # Reload in place, as shells may already hold the dictionary
+        #
+        canto_dict.reload()
+    return canto_dict
+###############################################################################
+
+
 
 ###############################################################################
 # Dictionary file parsing helper functions
@@ -736,7 +1067,7 @@ def is_comment(dict_line):
     :param  dict_line:  Dictionary file line
     :returns True if dict_line is a comment
     """
-    return re.match("#", dict_line)
+    return dict_line.startswith("#")
 ###############################################################################
 
 
@@ -749,35 +1080,36 @@ def parse_dict_line(dict_line):
     :param  dict_line:  Dictionary entry
     :returns a mapping between dictionary entry fields and values
     """
-    m = re.match(DICT_PATT, dict_line)
+    m = DICT_RE.match(dict_line)
     if m:
-        groups = m.groupdict()
-        eng_defs = groups[DE_FLD_ENGLISH].split("/") if groups[DE_FLD_ENGLISH] else [None]
-
-        return [(groups[DE_FLD_TRAD],
-                groups[DE_FLD_SIMP],
-                groups[DE_FLD_PINYIN].lower() if groups[DE_FLD_PINYIN] else None,
-                groups[DE_FLD_JYUTPING].lower() if groups[DE_FLD_JYUTPING] else None,
+        trad, simp, pinyin, jyutping, english, comment = m.group(*DICT_PATT_GROUPS)
+        pinyin = pinyin.lower() if pinyin else None
+        jyutping = jyutping.lower() if jyutping else None
+        eng_defs = english.split("/") if english else [None]
+
+        return [(trad,
+                simp,
+                pinyin,
+                jyutping,
                 eng.strip() if eng else None,
-                groups[DE_FLD_COMMENT]) for eng in eng_defs]
+                comment) for eng in eng_defs]
     return None
 ###############################################################################
 
 
 ###############################################################################
-def parse_dict_entries(dict_filename,
-                       max_entries = -1):
-    # type (str) -> List(Tuple)
+def iter_dict_entries(dict_filename,
+                      max_entries = -1):
+    # type (str) -> Iterator(Tuple)
     """
-    Parses a file of CC-CEDICT/CC-Canto/CC-CEDICT-Canto entries as a list of
-    tuples
+    Parses a file of CC-CEDICT/CC-Canto/CC-CEDICT-Canto entries, yielding
+    each parsed entry as a tuple without holding the whole file in memory
 
     :param  dict_filename:  Name of the dictionary file
     :param  max_entries:    Maximum number of entries to parse, -1 => parse the
                             entire file
-    :returns a list containing each entry parsed as a tuple
+    :returns a generator of each entry parsed as a tuple
     """
-    entries = list()
     entries_processed = 0
     with open(dict_filename) as dict_file:
         for dict_line in dict_file:
@@ -785,10 +1117,25 @@ def parse_dict_entries(dict_filename,
                 break
 
             if not is_comment(dict_line):
-                cccanto_tuples = parse_dict_line(dict_line)
-                entries.extend(cccanto_tuples)
+                yield from parse_dict_line(dict_line)
                 entries_processed += 1
-    return entries
+###############################################################################
+
+
+###############################################################################
+def parse_dict_entries(dict_filename,
+                       max_entries = -1):
+    # type (str) -> List(Tuple)
+    """
+    Parses a file of CC-CEDICT/CC-Canto/CC-CEDICT-Canto entries as a list of
+    tuples
+
+    :param  dict_filename:  Name of the dictionary file
+    :param  max_entries:    Maximum number of entries to parse, -1 => parse the
+                            entire file
+    :returns a list containing each entry parsed as a tuple
+    """
+    return list(iter_dict_entries(dict_filename, max_entries))
 ###############################################################################
 
 
@@ -798,6 +1145,89 @@ def parse_dict_entries(dict_filename,
 # General sqlite helper functions
 ###############################################################################
 
+###############################################################################
+@functools.lru_cache(maxsize=256)
+def re_search_func(pattern):
+    # type (str) -> Callable[[str], Optional[re.Match]]
+    """
+    Returns the search method of a compiled regular expression, caching the
+    result so that a pattern that is tested against every row of a table is
+    only compiled (and has its search method looked up) once.
+    If available, re2 is used so that search time is linear in the length of
+    the field, whatever the pattern; patterns re2 doesn't support (e.g. those
+    with backreferences or lookarounds) or would match differently (see
+    RE2_INCOMPATIBLE_PATT) are compiled with re.
+
+    :param  pattern:    Regular expression
+    :returns the bound search method of the compiled regular expression
+    """
+    if re2 is not None and not RE2_INCOMPATIBLE_RE.search(pattern):
+        try:
+            return re2.compile(pattern, RE2_OPTIONS).search
+        except re2.error:
+            pass
+    return re.compile(pattern).search
+###############################################################################
+
+
+###############################################################################
+def re_required_literal(pattern):
+    # type (str) -> Optional[str]
+    """
+    Identifies the longest literal substring that any string matching a
+    regular expression must contain.
+    The analysis is conservative: patterns with alternations or inline flags
+    aren't analysed, and the content of groups, character classes and escape
+    sequences is ignored, so the result may be shorter than it could be (but
+    is always required).
+
+    :param  pattern:    Regular expression
+    :returns the literal substring, or None if one can't be identified
+    """
+    if "|" in pattern or "(?" in pattern:
+        return None
+
+    literals = [str()]
+    group_depth = 0
+    patt_idx = 0
+    while patt_idx < len(pattern):
+        patt_char = pattern[patt_idx]
+        if patt_char == "\\":
+            # Skip the whole escape sequence
+            literals.append(str())
+            patt_idx = RE_ESCAPE_RE.match(pattern, patt_idx).end() - 1
+        elif patt_char == "[":
+            # Skip to the end of the character class, bearing in mind that a
+            # "]" straight after the opening "[" (or "[^") is part of the class
+            patt_idx += 1
+            if pattern[patt_idx:patt_idx+1] == "^":
+                patt_idx += 1
+            if pattern[patt_idx:patt_idx+1] == "]":
+                patt_idx += 1
+            while patt_idx < len(pattern) and pattern[patt_idx] != "]":
+                patt_idx += 2 if pattern[patt_idx] == "\\" else 1
+            literals.append(str())
+        elif patt_char in "()":
+            group_depth += 1 if patt_char == "(" else -1
+            literals.append(str())
+        elif patt_char in "?*{":
+            # The preceding character is optional/may not appear
+            literals[-1] = literals[-1][:-1]
+            literals.append(str())
+            if patt_char == "{":
+                while patt_idx < len(pattern) and pattern[patt_idx] != "}":
+                    patt_idx += 1
+        elif patt_char in "+.^$":
+            literals.append(str())
+        elif group_depth == 0:
+            literals[-1] += patt_char
+        patt_idx += 1
+
+    longest_literal = max(literals, key=len)
+    return longest_literal if longest_literal else None
+###############################################################################
+
+
 ###############################################################################
 def regexp(pattern, field):
     # type (str, str) -> Bool
@@ -810,14 +1240,13 @@ def regexp(pattern, field):
     :param  field:      Field being regular expression tested
     :returns True if field matches pattern.
     """
-    re_pattern = re.compile(pattern)
-    return field and re_pattern.search(field) is not None
+    return field and re_search_func(pattern)(field) is not None
 ###############################################################################
 
 
 ###############################################################################
 def table_exists(sqlcur, table_name):
-    # type (Cursor, str -> int)
+    # type (Cursor, str -> bool)
     """
     Checks if a table with the given name exists
 
@@ -825,9 +1254,24 @@ def table_exists(sqlcur, table_name):
     :param  table_name: Name of the table
     :returns True if the table exists
     """
-    sqlcur.execute("SELECT COUNT(*) AS table_count FROM sqlite_master WHERE name = ?",
+    sqlcur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? LIMIT 1",
                    (table_name,))
-    return (sqlcur.fetchone()[0] != 0)
+    return (sqlcur.fetchone() is not None)
+###############################################################################
+
+
+###############################################################################
+def table_columns(sqlcur, table_name):
+    # type (Cursor, str -> List[str])
+    """
+    Returns the column names for a given table
+
+    :param  sqlcur:     Cursor instance for running queries
+    :param  table_name: Name of the table
+    :returns a list of the table's column names
+    """
+    sqlcur.execute(f"PRAGMA table_info({table_name})")
+    return [row[1] for row in sqlcur.fetchall()]
 ###############################################################################
 
 
@@ -859,10 +1303,17 @@ def show_query(sqlcur,
     :param as_dict: If True, displays each row returned as a dictionary
     :returns nothing
     """
-    if as_dict:
-        pprint([dict(row) for row in sqlcur.execute(query)])
-    else:
-        pprint([tuple(row) for row in sqlcur.execute(query)])
+    #
+    # Show the results a batch at a time, rather than building the whole
+    # result set in memory, so large results are shown as several lists (the
+    # first batch is always shown, so no results are shown as an empty list)
+    #
+    row_type = dict if as_dict else tuple
+    sqlcur.execute(query)
+    rows = sqlcur.fetchmany(1024)
+    pprint([row_type(row) for row in rows])
+    while rows := sqlcur.fetchmany(1024):
+        pprint([row_type(row) for row in rows])
 ###############################################################################
 
 
@@ -925,6 +1376,10 @@ class CmdTkn(object):
         self.cmd_end_patt   = cmd_end_patt
         self.inc_start_tkn  = inc_start_tkn
         self.inc_end_tkn    = inc_end_tkn
+
+        # Compiled patterns, so they aren't looked up for every command parsed
+        self.cmd_start_re   = re.compile(cmd_start_patt)
+        self.cmd_end_re     = re.compile(cmd_end_patt)
     ###########################################################################
 
 
@@ -976,13 +1431,13 @@ class CmdTkn(object):
         #
         # Identify the end of the command token, and extract its content
         #
-        end_tkn_match = re.search(self.cmd_end_patt, tkn_src_str[tkn_start+1:])
+        end_tkn_match = self.cmd_end_re.search(tkn_src_str, tkn_start + 1)
         if end_tkn_match:
-            tkn_end = tkn_start + end_tkn_match.span()[1]
+            tkn_end = end_tkn_match.end() - 1
             if self.inc_end_tkn:
                 content_range_end = tkn_end
             else:
-                content_range_end = tkn_start + end_tkn_match.span()[0] + 1
+                content_range_end = end_tkn_match.start()
         cmd_content = self.get_cmd_content(tkn_src_str, content_range_start, content_range_end)
 
         return cmd_content, tkn_end
@@ -993,45 +1448,27 @@ class CmdTkn(object):
 # Command token subclass for parsing a dictionary search term
 ###############################################################################
 class DictSearchTermCmdTkn(CmdTkn):
+    FIELD_GROUP_NAME        = "search_field"
+    VALUE_GROUP_NAME        = "search_value"
+    RE_SEARCH_GROUP_NAME    = "search_with_re"
+
+    SEARCH_TERM_RE          = re.compile(fr'(?P<{FIELD_GROUP_NAME}>\w+)\s+"?(?P<{VALUE_GROUP_NAME}>[^"]+)"?(\s+(?P<{RE_SEARCH_GROUP_NAME}>\w+))?')
+
     def get_cmd_content(self,
                         tkn_src_str,
                         content_range_start,
                         content_range_end):
         cmd_content = None
         raw_content = super().get_cmd_content(tkn_src_str, content_range_start, content_range_end)
-        search_val_patt = '(?P<search_val_complex>"(?P<search_val_quoted>[^"]+)")|(?P<search_val>[^\\s]+)'
-
-        field_group_name = "search_field"
-        value_group_name = "search_value"
-        re_search_group_name = "search_with_re"
-        
-        search_term_patt = fr'(?P<{field_group_name}>\w+)\s+"?(?P<{value_group_name}>[^"]+)"?(\s+(?P<{re_search_group_name}>\w+))?'
 
-        search_val_match = re.match(search_term_patt, raw_content)
+        search_val_match = self.SEARCH_TERM_RE.match(raw_content)
         if search_val_match is not None:
             match_groups = search_val_match.groupdict()
-            search_field = match_groups[field_group_name]
-            search_value = match_groups[value_group_name]
-            search_with_re = match_groups[re_search_group_name] or False
-
-            cmd_content = DictSearchTerm(search_value, search_field=eval(search_field), use_re=search_with_re)
-
-
-#       search_val_match = re.match(search_val_patt, raw_content)
-#       if search_val_match:
-#           search_value = search_val_match["search_val_quoted"]
-#           if not search_value:
-#               search_value = search_val_match["search_val"]
+            search_field = match_groups[self.FIELD_GROUP_NAME]
+            search_value = match_groups[self.VALUE_GROUP_NAME]
+            search_with_re = match_groups[self.RE_SEARCH_GROUP_NAME] or False
 
-#           search_term_args = {}
-#           search_term_content = raw_content[search_val_match.span()[1]:].strip()
-#           if search_term_content:
-#               for search_term_elem in search_term_content.split():
-#                   if str_to_bool(search_term_elem):
-#                       search_term_args["use_re"] = str_to_bool(search_term_elem)
-#                   elif search_term_elem in DE_FLDS_NAMES:
-#                       search_term_args["search_field"] = eval(search_term_elem)
-#           cmd_content = DictSearchTerm(search_value, **search_term_args)
+            cmd_content = DictSearchTerm(search_value, search_field=DE_FLDS_BY_NAME[search_field], use_re=search_with_re)
 
         return cmd_content
 ###############################################################################
@@ -1046,7 +1483,7 @@ class FldListCmdTkn(CmdTkn):
                         content_range_start,
                         content_range_end):
         raw_cmd_content = super().get_cmd_content(tkn_src_str, content_range_start, content_range_end)
-        return [eval(field_name) for field_name in raw_cmd_content.split()]
+        return [DE_FLDS_BY_NAME[field_name] for field_name in raw_cmd_content.split()]
 ###############################################################################
 
 
@@ -1084,8 +1521,7 @@ def parse_dict_search_cmd(cmd: str,
             #
             # Identify the latest token's definition
             #
-            tkn_def_matches = [defn for defn in cmd_tkn_defs if re.search(defn.cmd_start_patt, cmd[tkn_start])]
-            tkn_def = tkn_def_matches[0] if len(tkn_def_matches) > 0 else None
+            tkn_def = next((defn for defn in cmd_tkn_defs if defn.cmd_start_re.search(cmd[tkn_start])), None)
 
             if tkn_def:
                 cmd_content, tkn_end = tkn_def.parse_tkn(cmd, tkn_start)
@@ -1097,17 +1533,18 @@ def parse_dict_search_cmd(cmd: str,
                         search_expr.append(cmd_content)
                         cmd_comps["search_expr"] = search_expr
                 else:
-                    if str_to_bool(cmd_content) is not None:
+                    cmd_bool = str_to_bool(cmd_content)
+                    if cmd_bool is not None:
                         search_expr = cmd_comps.get("search_expr", None)
                         if (not search_expr or isinstance(search_expr, str)) and not "use_re" in cmd_comps:
-                            cmd_comps["use_re"] = str_to_bool(cmd_content)
+                            cmd_comps["use_re"] = cmd_bool
                         elif not "flatten_pinyin" in cmd_comps:
-                            cmd_comps["flatten_pinyin"] = str_to_bool(cmd_content)
+                            cmd_comps["flatten_pinyin"] = cmd_bool
                         elif not "compact" in cmd_comps:
-                            cmd_comps["compact"] = str_to_bool(cmd_content)
+                            cmd_comps["compact"] = cmd_bool
                     else:
                         if cmd_content in DE_FLDS_NAMES:
-                            cmd_comps["search_field"] = eval(cmd_content)
+                            cmd_comps["search_field"] = DE_FLDS_BY_NAME[cmd_content]
                         elif not search_expr:
                             if cmd[tkn_start] == '"' and not "use_re" in cmd_comps:
                                 #
@@ -1169,7 +1606,6 @@ class DictSearchCmd(cmd.Cmd):
     SET_CMD = "set"
     QUIT_CMD = "q"
     HELP_CMD = "?"
-    dictionary = CantoDict(DICT_DB_FILENAME)
 
     std_opts = dict()
     std_opts["try_all_fields"]  = True
@@ -1194,6 +1630,7 @@ class DictSearchCmd(cmd.Cmd):
                 OptDef(DICT_OPT_DISP_INDENT,    "str",  "", False)]
     def __init__(self):
         super().__init__()
+        self.dictionary = get_canto_dict(DICT_DB_FILENAME)
         self.settings = dict()
         for opt_def in DictSearchCmd.OPT_DEFS:
             self.settings[opt_def.name] = {"def": opt_def}
@@ -1249,10 +1686,12 @@ class DictSearchCmd(cmd.Cmd):
             opts_to_show.append(opt_name)
 
         if opts_to_show:
+            # Print setting(s), all at once
+            opt_strings = list()
             for opt_name in opts_to_show:
-                # Print setting(s)
                 opt_setting = self.settings[opt_name]
-                print("{} = {}".format(opt_name, opt_setting.get("value", opt_setting["def"].default)))
+                opt_strings.append(f"{opt_name} = {opt_setting.get('value', opt_setting['def'].default)}")
+            sys.stdout.write("\n".join(opt_strings) + "\n")
             return
 
         opt_setting = self.settings[opt_name]
@@ -1263,15 +1702,18 @@ class DictSearchCmd(cmd.Cmd):
         elif opt_type == "list":
             opt_val = opt_val.split()
 
-        canto_logger.log(logging.INFO, "BEFORE settings")
-        pprint(self.settings)
+        # Only format the settings for display if they'll be logged
+        show_settings = canto_logger.isEnabledFor(logging.INFO)
+        if show_settings:
+            canto_logger.log(logging.INFO, "BEFORE settings")
+            pprint(self.settings)
 
-        print("Setting: '{}'".format(opt_name))
-        print("\tto: '{}'".format(opt_val))
+        sys.stdout.write(f"Setting: '{opt_name}'\n\tto: '{opt_val}'\n")
         opt_setting["value"] = opt_val
 
-        canto_logger.log(logging.INFO, "AFTER settings")
-        pprint(self.settings)
+        if show_settings:
+            canto_logger.log(logging.INFO, "AFTER settings")
+            pprint(self.settings)
 
     def do_search(self, arg):
         for opt_name in self.settings:
@@ -1286,11 +1728,11 @@ class DictSearchCmd(cmd.Cmd):
                     self.cmd_comps[opt_name] = list()
                     for val in opt_val:
                         if opt_def.eval:
-                            val = eval(val)
+                            val = DE_FLDS_BY_NAME[val]
                         self.cmd_comps[opt_name].append(val)
                 elif opt_type == "str" and opt_def.eval:
                     if opt_val:
-                        self.cmd_comps[opt_name] = eval(opt_val)
+                        self.cmd_comps[opt_name] = DE_FLDS_BY_NAME[opt_val]
                 else:
                     self.cmd_comps[opt_name] = opt_val
 
@@ -1321,15 +1763,16 @@ class DictSearchCmd(cmd.Cmd):
 # An interactive shell for searching the dictionary
 ###############################################################################
 @click_group_with_default(prompt="ccdict $ ", debug=False, custom_parser=parse_dict_search_cmd)
+@click.option("--force-reload", is_flag=True, default=False, help="Rebuild the dictionary database from the dictionary text files")
 @click.pass_context
-def ccdict_shell(ctx: click.Context):
+def ccdict_shell(ctx: click.Context, force_reload: bool):
     ctx.allow_extra_args = True
     ctx.ignore_unknown_options = True
     # Ensure that ctx.obj exists and is a dict
     ctx.ensure_object(dict)
 
     # Use ctx.obj to store the dictionary
-    ctx.obj["dictionary"] = CantoDict(DICT_DB_FILENAME)
+    ctx.obj["dictionary"] = get_canto_dict(DICT_DB_FILENAME, force_reload=force_reload)
     initial_opts: List[DictSearchOpt] = [DictSearchOpt(id=DictSearchOptId.DSO_DISPLAY_FMT, type=DictSearchOutputFormat, default_value=DictSearchOutputFormat.DSOF_ASCII)]
     ctx.obj["opts"]: Dict[DictSearchOptId, DictSearchOpt] = {initial_opt.id: initial_opt for initial_opt in initial_opts}
 
@@ -1367,7 +1810,7 @@ def search(ctx: click.Context, search_term: str,
     cmd_comps["lazy_eval"] = lazy
     cmd_comps["use_re"] = use_re
     cmd_comps["flatten_pinyin"] = flatten
-    cmd_comps["fields"] = [eval(field_name) for field_name in display_field]
+    cmd_comps["fields"] = [DE_FLDS_BY_NAME[field_name] for field_name in display_field]
     cmd_comps["output_format"] = CantoDict.DictOutputFormat.__getitem__(f"DOF_{output_format}")
     cmd_comps["compact"] = compact
 
@@ -0,0 +1,6 @@
+###############################################################################
+# pytest configuration
+# Being at the repository root, this file has pytest put the root on sys.path,
+# so tests can import ccdict however the suite is run (e.g. `pytest` as well as
+# `python -m pytest`)
+###############################################################################
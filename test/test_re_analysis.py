@@ -0,0 +1,94 @@
+###############################################################################
+# Tests for the regular expression analysis that lets regular expression
+# searches be performed by cheaper means (GLOB/= comparisons, full-text search
+# pre-filtering)
+###############################################################################
+import re
+
+import pytest
+
+from ccdict import DE_FLD_ENGLISH, DictSearchTerm, re_required_literal, regexp
+
+
+###############################################################################
+@pytest.mark.parametrize("pattern, literal", [
+    ("abc",                             "abc"),
+    ("^abc$",                           "abc"),
+    ("ab+cde",                          "cde"),
+    ("abc?de",                          "ab"),
+    ("to (go|come)",                    None),
+    ("(?i)abc",                         None),
+    ("[abc]de",                         "de"),
+    ("[]abc]de",                        "de"),
+    (r"\.abc",                          "abc"),
+    (r"\x41bc",                         "bc"),
+    (r"\u0041bc",                       "bc"),
+    (r"\U00000041bc",                   "bc"),
+    (r"\N{LATIN CAPITAL LETTER A}bc",   "bc"),
+    (r"\101bc",                         "bc"),
+    (r"\0bc",                           "bc"),
+    (r"(a)\1bc",                        "bc"),
+])
+def test_re_required_literal(pattern, literal):
+    assert re_required_literal(pattern) == literal
+###############################################################################
+
+
+###############################################################################
+@pytest.mark.parametrize("pattern, text", [
+    (r"\x41bc",                         "good; Abc thing"),
+    (r"\101bc",                         "good; Abc thing"),
+    (r"\u0041bc",                       "good; Abc thing"),
+    (r"\N{LATIN CAPITAL LETTER A}bc",   "good; Abc thing"),
+])
+def test_re_required_literal_in_matches(pattern, text):
+    # Any text the pattern matches must contain the required literal
+    assert re.search(pattern, text)
+    assert re_required_literal(pattern) in text
+###############################################################################
+
+
+###############################################################################
+@pytest.mark.parametrize("pattern, literal_search", [
+    ("^abc$",   ("=", "abc")),
+    ("^abc",    ("GLOB", "abc*")),
+    ("^abc.*$", ("GLOB", "abc*")),
+    ("abc$",    ("GLOB", "*abc")),
+    ("abc",     ("GLOB", "*abc*")),
+    ("a.c",     None),
+    ("ab*c",    None),
+    (r"\x41bc", None),
+    ("[abc]",   None),
+])
+def test_re_literal_search(pattern, literal_search):
+    assert DictSearchTerm(pattern, DE_FLD_ENGLISH, True).re_literal_search == literal_search
+###############################################################################
+
+
+###############################################################################
+@pytest.mark.parametrize("pattern, text", [
+    (r"^我\w$",     "我們"),
+    (r"\d",         "３"),
+    (r"^\w+$",      "café"),
+    (r"\bcafé\b",   "a café"),
+    (r"\s",         "　"),
+    (r"^我.$",      "我們"),
+])
+def test_regexp_unicode(pattern, text):
+    # REGEXP must match as re does, whichever engine performs the search
+    assert regexp(pattern, text) == bool(re.search(pattern, text))
+###############################################################################
+
+
+###############################################################################
+@pytest.mark.filterwarnings("ignore:Possible nested set:FutureWarning")
+@pytest.mark.parametrize("pattern, text", [
+    (r"^.{,1}$",        "佢"),
+    (r"surnam{,1}e",    "surname"),
+    (r"[[:alpha:]]",    "a"),
+    (r"[[:alpha:]]",    ":]"),
+])
+def test_regexp_re2_syntax(pattern, text):
+    # REGEXP must match as re does for syntax re2 interprets differently
+    assert regexp(pattern, text) == bool(re.search(pattern, text))
+###############################################################################